@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from importdata import NS_PER_HOUR, slice_sorted, from_epoch_days
+
+# Rollup grain of the cube; every dashboard view is a slice + re-aggregation of it
+CUBE_DIMENSIONS = ['epoch_hour', 'service_name', 'endpoint', 'region', 'status', 'response_status_code']
+CUBE_MEASURES = ['count', 'latency_sum']
+# Days whose volume moves by more than this between the two periods are flagged
+DIFF_THRESHOLD_PCT = 3.0
+# Dimensions a change between periods is attributed to
+CONTRIBUTION_KEYS = ['service_name', 'endpoint', 'region', 'response_status_code']
+
+
+def _rollup(frame, keys):
+    return frame.groupby(keys, observed=True, dropna=False)[CUBE_MEASURES].sum().reset_index()
+
+
+def _finish(cube):
+    cube = cube.sort_values('epoch_hour', kind='stable', ignore_index=True)
+    cube['epoch_day'] = (cube['epoch_hour'] // 24).astype(np.int32)
+    return cube
+
+
+def build_cube(df):
+    latency = df['latency_ms'].fillna(0).astype(np.int64) if 'latency_ms' in df else 0
+    rows = df[CUBE_DIMENSIONS].assign(count=1, latency_sum=latency)
+    return _finish(_rollup(rows, CUBE_DIMENSIONS))
+
+
+def merge_cubes(*cubes):
+    combined = pd.concat([cube[CUBE_DIMENSIONS + CUBE_MEASURES] for cube in cubes], ignore_index=True)
+    # concat falls back to object when category sets differ between inputs
+    for col in CUBE_DIMENSIONS:
+        if combined[col].dtype == object:
+            combined[col] = combined[col].astype('category')
+    return _finish(_rollup(combined, CUBE_DIMENSIONS))
+
+
+def append_cubes(cube, later):
+    # cube followed by a cube holding only later hours, without re-aggregating: no cell
+    # can be in both, and the result stays sorted. None when the hours overlap.
+    if len(cube) and len(later) and later['epoch_hour'].iat[0] <= cube['epoch_hour'].iat[-1]:
+        return None
+    columns = {}
+    for col in cube.columns:
+        first, second = cube[col], later[col]
+        if isinstance(first.dtype, pd.CategoricalDtype) and isinstance(second.dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([first, second], ignore_order=True)
+        else:
+            columns[col] = pd.concat([first, second], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def filter_dimensions(frame, services=None, endpoints=None, regions=None):
+    # Works on the cube and on raw rows alike
+    mask = np.ones(len(frame), dtype=bool)
+    for col, selected in (('service_name', services), ('endpoint', endpoints), ('region', regions)):
+        if selected:
+            mask &= frame[col].isin(selected).to_numpy()
+    return frame if mask.all() else frame[mask]
+
+
+def hour_positions(cube, start, end):
+    # [first, stop) row positions of the hours in [start, end) of the hour-sorted cube
+    hours = cube['epoch_hour'].to_numpy()
+    bounds = [pd.Timestamp(start).value // NS_PER_HOUR, pd.Timestamp(end).value // NS_PER_HOUR]
+    first, stop = np.searchsorted(hours, bounds, side='left')
+    return int(first), int(stop)
+
+
+def slice_hours(cube, start, end):
+    # Hour granularity: the dashboard's periods are always whole days
+    return slice_sorted(cube, 'epoch_hour', pd.Timestamp(start).value // NS_PER_HOUR, pd.Timestamp(end).value // NS_PER_HOUR)
+
+
+def _with_status(cube, status):
+    return cube[cube['status'] == status]
+
+
+def daily_counts(cube, status):
+    counts = _with_status(cube, status).groupby('epoch_day')['count'].sum()
+    counts = counts[counts > 0]
+    return pd.DataFrame({"date": from_epoch_days(counts.index), "count": counts.to_numpy()})
+
+
+def _epoch_day(timestamp):
+    return pd.Timestamp(timestamp).value // NS_PER_HOUR // 24
+
+
+def aligned_daily_counts(cube1, cube2, status, period_1, period_2):
+    # Both periods' daily counts side by side, row i being day i+1 of each period. Periods
+    # are (start, end) with end exclusive, as for slice_hours; days without traffic count 0.
+    frames = []
+    for cube, (start, end) in ((cube1, period_1), (cube2, period_2)):
+        days = np.arange(_epoch_day(start), _epoch_day(end))
+        counts = _with_status(cube, status).groupby('epoch_day')['count'].sum().reindex(days, fill_value=0)
+        frames.append(pd.DataFrame({"date": from_epoch_days(days), "count": counts.to_numpy()}))
+    aligned = frames[0].join(frames[1], how='outer', lsuffix='_1', rsuffix='_2')
+    aligned[['count_1', 'count_2']] = aligned[['count_1', 'count_2']].astype('Int64')
+    aligned['delta'] = aligned['count_2'] - aligned['count_1']
+    base = aligned['count_1'].astype('Float64')
+    aligned['pct_change'] = (aligned['delta'] / base.where(base > 0) * 100).round(1)
+    aligned.insert(0, 'day', np.arange(1, len(aligned) + 1))
+    return aligned
+
+
+def period_diff(cube1, cube2, status, period_1, period_2, threshold_pct=DIFF_THRESHOLD_PCT):
+    # aligned_daily_counts with a 'flagged' column: |pct_change| above threshold_pct, or
+    # traffic on a day of period 2 where the same day of period 1 had none
+    diff = aligned_daily_counts(cube1, cube2, status, period_1, period_2)
+    appeared = (diff['count_1'] == 0) & (diff['count_2'] > 0)
+    diff['flagged'] = ((diff['pct_change'].abs() > threshold_pct) | appeared).fillna(False).astype(bool)
+    return diff
+
+
+def diff_totals(diff):
+    total_1, total_2 = int(diff['count_1'].sum()), int(diff['count_2'].sum())
+    pct = round((total_2 - total_1) / total_1 * 100, 1) if total_1 else None
+    return {"count_1": total_1, "count_2": total_2, "delta": total_2 - total_1, "pct_change": pct, "flagged_days": int(diff['flagged'].sum())}
+
+
+def contributions(cube1, cube2, status, keys=CONTRIBUTION_KEYS):
+    # Each combination of keys with its count in both periods and its share of all the
+    # movement, largest |delta| first. kind marks combinations new in period 2 or gone from it.
+    both = pd.concat(
+        [_with_status(cube1, status).assign(period=1), _with_status(cube2, status).assign(period=2)],
+        ignore_index=True,
+    )
+    counts = both.groupby(keys + ['period'], observed=True)['count'].sum().unstack('period', fill_value=0)
+    counts = counts.reindex(columns=[1, 2], fill_value=0)
+    table = pd.DataFrame({'p1': counts[1].to_numpy(), 'p2': counts[2].to_numpy()}, index=counts.index)
+    table['delta'] = table['p2'] - table['p1']
+    # Signed share of the summed |delta|: bounded and rankable even when rises and falls
+    # offset each other and the net change is near zero
+    movement = table['delta'].abs().sum()
+    table['share_pct'] = (table['delta'] / movement * 100).round(1) if movement else np.nan
+    table['kind'] = np.select(
+        [table['p1'] == 0, table['p2'] == 0, table['delta'] == 0], ['new', 'vanished', 'unchanged'], 'changed'
+    )
+    order = table['delta'].abs().to_numpy().argsort(kind='stable')[::-1]
+    return table.iloc[order].reset_index()
+
+
+def hourly_matrices(cubes, status):
+    # (code x hour-of-day) counts for each cube from a single bincount over all of them.
+    # One frame per cube, all indexed by the same sorted codes, with columns 0-23.
+    rows = [_with_status(cube, status) for cube in cubes]
+    code_idx, codes = pd.factorize(
+        np.concatenate([r['response_status_code'].to_numpy(dtype=np.float64, na_value=np.nan) for r in rows]),
+        sort=True,
+    )
+    which = np.repeat(np.arange(len(rows)), [len(r) for r in rows])
+    hours = np.concatenate([r['epoch_hour'].to_numpy() % 24 for r in rows]).astype(np.int64)
+    counts = np.concatenate([r['count'].to_numpy() for r in rows])
+    # factorize marks missing codes with -1
+    valid = code_idx >= 0
+    keys = (which[valid] * len(codes) + code_idx[valid]) * 24 + hours[valid]
+    flat = np.bincount(keys, weights=counts[valid], minlength=len(rows) * len(codes) * 24)
+    matrices = flat.astype(np.int64).reshape(len(rows), len(codes), 24)
+    index = pd.Index(codes.astype(np.int64), name='response_status_code')
+    return [pd.DataFrame(matrix, index=index, columns=pd.RangeIndex(24, name='hour')) for matrix in matrices]
+
+
+def code_totals(matrix):
+    totals = matrix.sum(axis=1)
+    return totals[totals > 0]
+
+
+def hour_counts(matrix, code):
+    hours = matrix.loc[code]
+    return hours[hours > 0]
+
+
+def group_counts(cube, status, keys):
+    counts = _with_status(cube, status).groupby(keys, observed=True)['count'].sum()
+    return counts[counts > 0].reset_index(name='count')
@@ -1,10 +1,14 @@
-from openai_client import compare_images, analyze_error_spread
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai_client import compare_images, analyze_error_spread, compare_images_stream, analyze_error_spread_stream
 
-def analyze_graphs(image1_b64, image2_b64, status, start_date_1=None, end_date_1=None, start_date_2=None, end_date_2=None, df1=None, df2=None):
+# Most LLM calls in flight at once for batch analysis
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+def analyze_graphs(daily, status, start_date_1=None, end_date_1=None, start_date_2=None, end_date_2=None, df1=None, df2=None):
     try:
         summary = compare_images(
-            image1_b64=image1_b64,
-            image2_b64=image2_b64,
+            daily=daily,
             df1=df1,
             df2=df2,
             status=status,
@@ -17,12 +21,48 @@ def analyze_graphs(image1_b64, image2_b64, status, start_date_1=None, end_date_1
     except Exception as e:
         return f"Error: {e}"
 
-def analyze_error_hourly_spread(df, error_code, date, status):
+def analyze_error_hourly_spread(hourly_counts, error_code, date, status, samples=None):
     try:
-        return analyze_error_spread(df, error_code, date, status)
+        return analyze_error_spread(hourly_counts, error_code, date, status, samples)
     except Exception as e:
         return f"Error: {e}"
 
+def analyze_error_spreads(jobs, max_workers=LLM_CONCURRENCY):
+    # jobs maps a key to analyze_error_hourly_spread's arguments. Yields (key, result)
+    # in completion order, so callers can show each answer as soon as it lands.
+    if not jobs:
+        return
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))))
+    try:
+        futures = {pool.submit(analyze_error_hourly_spread, *args): key for key, args in jobs.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # A rerun closes this generator early; drop queued calls instead of waiting them out
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def analyze_graphs_stream(daily, status, start_date_1=None, end_date_1=None, start_date_2=None, end_date_2=None, df1=None, df2=None):
+    return compare_images_stream(
+        daily=daily,
+        df1=df1,
+        df2=df2,
+        status=status,
+        start_date_1=start_date_1,
+        end_date_1=end_date_1,
+        start_date_2=start_date_2,
+        end_date_2=end_date_2
+    )
+
+def analyze_error_hourly_spread_stream(hourly_counts, error_code, date, status, samples=None):
+    return analyze_error_spread_stream(hourly_counts, error_code, date, status, samples)
+
+def stream_text(stream):
+    # Text deltas of a CompletionStream; a failure mid-stream ends it with the error
+    try:
+        yield from stream
+    except Exception as e:
+        yield f"Error: {e}"
+
 
 # from openai_client import compare_images, analyze_error_spread
 
@@ -1,10 +1,32 @@
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import io
-import base64
-from analysis import analyze_graphs, analyze_error_hourly_spread
-from importdata import load_data_from_csv
+import os
+import time
+from contextlib import contextmanager
+from startup_profile import phase, record, breakdown
+
+script_start = time.perf_counter()
+# matplotlib and the openai SDK are not imported here; see chart_render and openai_client.get_client()
+with phase("imports"):
+    import streamlit as st
+    import pandas as pd
+    import numpy as np
+    from analysis import analyze_graphs_stream, analyze_error_hourly_spread_stream, analyze_error_spreads, stream_text
+    from importdata import slice_day, from_epoch_days
+    from dataset import get_shared_dataset, invalidate_shared_dataset
+    from openai_client import in_flight
+    from chart_cache import chart_cache, chart_key
+    from chart_render import render as render_chart, render_many
+    from aggregates import DIFF_THRESHOLD_PCT, period_diff, diff_totals, contributions, filter_dimensions, daily_counts, hourly_matrices, code_totals, hour_counts
+
+# A single export, a directory of hourly drops, or a glob over them
+DATA_PATH = os.getenv("TELEMETRY_SOURCE", "api_telemetry_2_months.xlsx")
+# Heavy columns pulled from the columnar cache only for the rows a drilldown shows
+SAMPLE_COLUMNS = ['request_id', 'error_code', 'error_message', 'exception_type', 'backend_server', 'user_agent']
+SAMPLE_ROWS = 20
+CONTRIBUTORS_SHOWN = 15
+
+# The loaded frame is shared by every session; copy-on-write keeps filters and
+# derived columns from ever writing back into it.
+pd.set_option("mode.copy_on_write", True)
 
 st.set_page_config(layout="wide")
 st.title("📊 API Telemetry Diagnostics")
@@ -12,13 +34,20 @@ st.title("📊 API Telemetry Diagnostics")
 if "analysis_results" not in st.session_state:
     st.session_state["analysis_results"] = {}
 
-df = load_data_from_csv("api_telemetry_2_months.xlsx")
+with phase("dataset"):
+    dataset = get_shared_dataset(DATA_PATH)
+# Every chart and table below is answered from the pre-aggregated cube, never from raw rows
+cube = dataset.cube
 
 # Sidebar filters
 st.sidebar.header("📌 Filter Options")
-service_options = df['service_name'].dropna().unique().tolist()
-endpoint_options = df['endpoint'].dropna().unique().tolist()
-region_options = df['region'].dropna().unique().tolist()
+st.sidebar.caption(f"{dataset.row_count:,} rows in {len(dataset.parts)} file(s) · {len(cube):,} cube cells · {dataset.memory_usage() / 1e6:.1f} MB shared")
+if st.sidebar.button("🔄 Reload data"):
+    invalidate_shared_dataset(DATA_PATH)
+    st.rerun()
+service_options = cube['service_name'].dropna().unique().tolist()
+endpoint_options = cube['endpoint'].dropna().unique().tolist()
+region_options = cube['region'].dropna().unique().tolist()
 
 selected_services = st.sidebar.multiselect("🛠 Service Name", sorted(service_options))
 selected_endpoints = st.sidebar.multiselect("📍 Endpoint", sorted(endpoint_options))
@@ -44,156 +73,251 @@ if start_date_1 >= end_date_1 or start_date_2 >= end_date_2:
     st.error("Start date must be before end date.")
     st.stop()
 
-# Apply filters
-if selected_services:
-    df = df[df['service_name'].isin(selected_services)]
-if selected_endpoints:
-    df = df[df['endpoint'].isin(selected_endpoints)]
-if selected_regions:
-    df = df[df['region'].isin(selected_regions)]
+# Everything the page shows depends on these; any other widget only re-runs its own unit
+view_key = (
+    dataset.signature, tuple(selected_services), tuple(selected_endpoints), tuple(selected_regions),
+    status_toggle, start_date_1, end_date_1, start_date_2, end_date_2,
+)
+
+def memoized(name, key, compute):
+    # One remembered result per unit and session, recomputed only when its key changes
+    memo = st.session_state.setdefault("unit_memo", {})
+    if name not in memo or memo[name][0] != key:
+        memo[name] = (key, compute())
+    return memo[name][1]
+
+@contextmanager
+def timed_unit(name):
+    start = time.perf_counter()
+    yield
+    st.caption(f"⏱ {name}: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def filtered_periods():
+    # Each period is cut from the hour-sorted cube first, so only its own cells are filtered
+    selection = (selected_services, selected_endpoints, selected_regions)
+    return dataset.filter_period(start_date_1, end_date_1, *selection), dataset.filter_period(start_date_2, end_date_2, *selection)
+
+def period_facts():
+    # Day-by-day difference and its contributors, computed locally and handed to the LLM as facts
+    daily_diff = period_diff(cube1, cube2, status_toggle, (start_date_1, end_date_1), (start_date_2, end_date_2))
+    return daily_diff, diff_totals(daily_diff), contributions(cube1, cube2, status_toggle)
+
+with phase("filter"):
+    cube1, cube2 = memoized("periods", view_key, filtered_periods)
+    daily_diff, totals, contributors = memoized("period_facts", view_key, period_facts)
 
-df1 = df[(df['timestamp'] >= start_date_1) & (df['timestamp'] < end_date_1)].copy()
-df2 = df[(df['timestamp'] >= start_date_2) & (df['timestamp'] < end_date_2)].copy()
+def create_static_line_chart(df_chart, title):
+    # PNGs are cached on the plotted values, so unchanged charts are not redrawn on reruns
+    key = chart_key("line", title, df_chart["date"], df_chart["count"])
+    return chart_cache.png(key, lambda: render_chart("line", df_chart["date"].tolist(), df_chart["count"].to_numpy(), title))
+
+@st.fragment
+def period_unit(view_key, cube1, cube2, daily_diff, totals, contributors):
+    with timed_unit("Period comparison"):
+        # Generate charts; nothing is rendered to PNG unless they are shown
+        if st.checkbox("📈 Show daily charts", value=True):
+            png1 = create_static_line_chart(daily_counts(cube1, status_toggle), "Period 1")
+            png2 = create_static_line_chart(daily_counts(cube2, status_toggle), "Period 2")
 
-def plot_counts_by_day(df_filtered, status):
-    df_filtered = df_filtered[df_filtered['status'].str.lower() == status.lower()]
-    df_filtered["date"] = df_filtered["timestamp"].dt.date
-    return df_filtered.groupby("date").size().reset_index(name="count")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.image(png1, use_column_width=True)
+            with col2:
+                st.image(png2, use_column_width=True)
 
-def create_static_line_chart(df_chart, title):
-    fig, ax = plt.subplots()
-    ax.plot(df_chart["date"], df_chart["count"], marker='o')
-    ax.set_title(title)
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Count")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-# Generate charts
-df1_chart = plot_counts_by_day(df1, status_toggle)
-df2_chart = plot_counts_by_day(df2, status_toggle)
-
-col1, col2 = st.columns(2)
-with col1:
-    buf1 = create_static_line_chart(df1_chart, "Period 1")
-    st.image(buf1, use_column_width=True)
-with col2:
-    buf2 = create_static_line_chart(df2_chart, "Period 2")
-    st.image(buf2, use_column_width=True)
-
-def buf_to_base64_image(buf):
-    return base64.b64encode(buf.read()).decode()
+        st.markdown(f"### 📋 Daily Differences (>{DIFF_THRESHOLD_PCT:g}% flagged)")
+        st.caption(
+            f"Period 1: {totals['count_1']:,} · Period 2: {totals['count_2']:,} · "
+            f"change {totals['delta']:+,}" + (f" ({totals['pct_change']:+}%)" if totals['pct_change'] is not None else "")
+            + f" · {totals['flagged_days']} of {len(daily_diff)} days flagged"
+        )
+        st.dataframe(daily_diff, hide_index=True)
 
-# GPT Compare (Main LLM Analysis)
-if st.button("🧠 Analyze with LLM"):
-    # Reset buffer positions before reading
-    buf1.seek(0)
-    buf2.seek(0)
-    img1_b64 = buf_to_base64_image(buf1)
-    img2_b64 = buf_to_base64_image(buf2)
-
-    with st.spinner("Analyzing..."):
-        result = analyze_graphs(
-            image1_b64=img1_b64,
-            image2_b64=img2_b64,
-            status=status_toggle,
-            start_date_1=start_date_1,
-            end_date_1=end_date_1,
-            start_date_2=start_date_2,
-            end_date_2=end_date_2,
-            df1=df1,
-            df2=df2
+        # Which service/endpoint/region/code combinations the change comes from
+        st.markdown("### 🧭 Contributors to the Change")
+        st.caption(
+            f"Top {min(CONTRIBUTORS_SHOWN, len(contributors))} of {len(contributors)} combinations by |delta| · "
+            f"share_pct is each one's signed share of all movement (sum of |delta|, {contributors['delta'].abs().sum():,}); net change {totals['delta']:+,}"
         )
-    st.session_state["llm_result"] = result
+        st.dataframe(contributors.head(CONTRIBUTORS_SHOWN), hide_index=True)
+
+period_unit(view_key, cube1, cube2, daily_diff, totals, contributors)
+
+def stream_timing(stream):
+    notes = []
+    if stream.cached:
+        notes.append("Served from the response cache")
+    elif stream.coalesced:
+        notes.append("Joined an identical request already in flight")
+    elif stream.time_to_first_token is not None:
+        notes.append(f"First token after {stream.time_to_first_token:.1f}s · complete after {stream.elapsed:.1f}s")
+    if stream.summary_stats:
+        stats = stream.summary_stats
+        notes.append(f"summary table {stats['kept']}/{stats['groups']} groups, {stats['tokens']:,} tokens ({stats['tokens_saved']:,} saved)")
+    return " · ".join(notes)
 
-if "llm_result" in st.session_state:
-    st.markdown("### 🧠 LLM Summary")
-    st.write(st.session_state["llm_result"])
+# GPT Compare (Main LLM Analysis)
+@st.fragment
+def llm_summary_unit(cube1, cube2, daily_diff):
+    with timed_unit("LLM summary"):
+        if st.button("🧠 Analyze with LLM"):
+            stream = analyze_graphs_stream(
+                daily=daily_diff,
+                status=status_toggle,
+                start_date_1=start_date_1,
+                end_date_1=end_date_1,
+                start_date_2=start_date_2,
+                end_date_2=end_date_2,
+                df1=cube1,
+                df2=cube2
+            )
+            st.markdown("### 🧠 LLM Summary")
+            st.session_state["llm_result"] = st.write_stream(stream_text(stream))
+            st.session_state["llm_timing"] = stream_timing(stream)
+            st.caption(st.session_state["llm_timing"])
+        elif "llm_result" in st.session_state:
+            st.markdown("### 🧠 LLM Summary")
+            st.write(st.session_state["llm_result"])
+            st.caption(st.session_state.get("llm_timing", ""))
+
+llm_summary_unit(cube1, cube2, daily_diff)
+
+def day_rows(selected_date):
+    if selected_date is None:
+        return None
+    rows = filter_dimensions(dataset.day_rows(selected_date), selected_services, selected_endpoints, selected_regions)
+    return rows[rows['status'] == status_toggle]
+
+def sample_requests(rows, code):
+    return dataset.fetch(rows[rows['response_status_code'] == code].head(SAMPLE_ROWS), SAMPLE_COLUMNS)
 
 # === 🔍 Per-Day, Per-Error Comparison Drilldown ===
-st.markdown("## 🔍 Single Day Error Comparison Drilldown")
-
-all_dates_1 = sorted(df1['timestamp'].dt.date.unique())
-all_dates_2 = sorted(df2['timestamp'].dt.date.unique())
-
-col1, col2 = st.columns(2)
-with col1:
-    selected_date_1 = st.selectbox("Select a date from Period 1", all_dates_1)
-with col2:
-    selected_date_2 = st.selectbox("Select a date from Period 2", all_dates_2)
-
-filt_df1 = df1[(df1['timestamp'].dt.date == selected_date_1) & (df1['status'].str.lower() == status_toggle.lower())]
-filt_df2 = df2[(df2['timestamp'].dt.date == selected_date_2) & (df2['status'].str.lower() == status_toggle.lower())]
-
-if filt_df1.empty or filt_df2.empty:
-    st.info("No matching data for selected dates.")
-else:
-    st.markdown(f"### 📊 Error Comparison: {selected_date_1} vs {selected_date_2}")
-    p1_counts = filt_df1['response_status_code'].value_counts()
-    p2_counts = filt_df2['response_status_code'].value_counts()
-    all_codes = sorted(set(p1_counts.index).union(set(p2_counts.index)))
-
-    comparison_data = []
-    for code in all_codes:
-        comparison_data.append({
-            "Error Code": code,
-            "Period 1 Count": p1_counts.get(code, 0),
-            "Period 2 Count": p2_counts.get(code, 0)
-        })
-    comparison_df = pd.DataFrame(comparison_data)
-    st.dataframe(comparison_df)
-
-    for row in comparison_df.itertuples():
-        with st.expander(f"🔎 Error {row._1} Comparison"):
-            col1, col2 = st.columns(2)
-
-            with col1:
-                df1_hourly = filt_df1[filt_df1['response_status_code'] == row._1].copy()
-                df1_hourly['hour'] = df1_hourly['timestamp'].dt.hour
-                fig1, ax1 = plt.subplots()
-                hourly_counts1 = df1_hourly.groupby('hour').size()
-                ax1.bar(hourly_counts1.index, hourly_counts1.values)
-                ax1.set_title(f"{selected_date_1} Error {row._1}")
-                ax1.set_xlabel("Hour")
-                ax1.set_ylabel("Count")
-                plt.tight_layout()
-                st.pyplot(fig1)
-                plt.close(fig1)
-
-                analysis_key = f"p1_{row._1}"
-                if st.button(f"🧠 Analyze {row._1} on {selected_date_1}", key=analysis_key):
-                    with st.spinner("Analyzing..."):
-                        result = analyze_error_hourly_spread(df1_hourly, row._1, selected_date_1, status_toggle)
+@st.fragment
+def drilldown_unit(view_key, cube1, cube2):
+    with timed_unit("Drilldown"):
+        st.markdown("## 🔍 Single Day Error Comparison Drilldown")
+
+        all_dates_1 = from_epoch_days(np.unique(cube1['epoch_day'].to_numpy()))
+        all_dates_2 = from_epoch_days(np.unique(cube2['epoch_day'].to_numpy()))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            selected_date_1 = st.selectbox("Select a date from Period 1", all_dates_1)
+        with col2:
+            selected_date_2 = st.selectbox("Select a date from Period 2", all_dates_2)
+
+        # Every count below (table, charts, LLM inputs) is read from these two code x hour matrices
+        hours1, hours2 = memoized("drilldown_hours", (view_key, selected_date_1, selected_date_2), lambda: hourly_matrices([
+            slice_day(cube1, selected_date_1) if selected_date_1 is not None else cube1.iloc[0:0],
+            slice_day(cube2, selected_date_2) if selected_date_2 is not None else cube2.iloc[0:0],
+        ], status_toggle))
+        p1_counts = code_totals(hours1)
+        p2_counts = code_totals(hours2)
+
+        if p1_counts.empty or p2_counts.empty:
+            st.info("No matching data for selected dates.")
+        else:
+            st.markdown(f"### 📊 Error Comparison: {selected_date_1} vs {selected_date_2}")
+            all_codes = sorted(set(p1_counts.index).union(set(p2_counts.index)))
+
+            comparison_data = []
+            for code in all_codes:
+                comparison_data.append({
+                    "Error Code": code,
+                    "Period 1 Count": p1_counts.get(code, 0),
+                    "Period 2 Count": p2_counts.get(code, 0)
+                })
+            comparison_df = pd.DataFrame(comparison_data)
+            st.dataframe(comparison_df)
+
+            day_rows1 = memoized("day_rows_1", (view_key, selected_date_1), lambda: day_rows(selected_date_1))
+            day_rows2 = memoized("day_rows_2", (view_key, selected_date_2), lambda: day_rows(selected_date_2))
+
+            analyze_all = st.button("🧠 Analyze all error codes on both dates")
+            result_slots = {}
+            # Charts not in the cache are drawn together after the loop, off the script thread
+            chart_slots = {}
+            chart_jobs = {}
+
+            def hourly_chart(counts, title):
+                key = chart_key("hourly_bar", title, counts.index, counts.values)
+                png = chart_cache.get(key)
+                if png is not None:
+                    st.image(png, use_column_width=True)
+                    return
+                chart_jobs[key] = ("hourly_bar", counts.index.to_numpy(), counts.to_numpy(), title)
+                chart_slots.setdefault(key, []).append(st.empty())
+
+            for row in comparison_df.itertuples():
+                with st.expander(f"🔎 Error {row._1} Comparison"):
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        hourly_counts1 = hour_counts(hours1, row._1)
+                        hourly_chart(hourly_counts1, f"{selected_date_1} Error {row._1}")
+
+                        if st.checkbox("📄 Show sample requests", key=f"samples_p1_{row._1}"):
+                            st.dataframe(sample_requests(day_rows1, row._1))
+
+                        analysis_key = f"p1_{row._1}"
+                        clicked = st.button(f"🧠 Analyze {row._1} on {selected_date_1}", key=analysis_key)
+                        result_slots[analysis_key] = st.empty()
+                        if clicked:
+                            samples = sample_requests(day_rows1, row._1)
+                            stream = analyze_error_hourly_spread_stream(hourly_counts1, row._1, selected_date_1, status_toggle, samples)
+                            st.session_state["analysis_results"][analysis_key] = result_slots[analysis_key].container().write_stream(stream_text(stream))
+                        elif analysis_key in st.session_state["analysis_results"]:
+                            result_slots[analysis_key].write(st.session_state["analysis_results"][analysis_key])
+
+                    with col2:
+                        hourly_counts2 = hour_counts(hours2, row._1)
+                        hourly_chart(hourly_counts2, f"{selected_date_2} Error {row._1}")
+
+                        if st.checkbox("📄 Show sample requests", key=f"samples_p2_{row._1}"):
+                            st.dataframe(sample_requests(day_rows2, row._1))
+
+                        analysis_key = f"p2_{row._1}"
+                        clicked = st.button(f"🧠 Analyze {row._1} on {selected_date_2}", key=analysis_key)
+                        result_slots[analysis_key] = st.empty()
+                        if clicked:
+                            samples = sample_requests(day_rows2, row._1)
+                            stream = analyze_error_hourly_spread_stream(hourly_counts2, row._1, selected_date_2, status_toggle, samples)
+                            st.session_state["analysis_results"][analysis_key] = result_slots[analysis_key].container().write_stream(stream_text(stream))
+                        elif analysis_key in st.session_state["analysis_results"]:
+                            result_slots[analysis_key].write(st.session_state["analysis_results"][analysis_key])
+
+            for key, png, seconds in render_many(chart_jobs):
+                chart_cache.put(key, png, seconds)
+                for slot in chart_slots[key]:
+                    slot.image(png, use_column_width=True)
+
+            if analyze_all:
+                # Every code on both dates at once; each answer lands in its expander as it completes
+                jobs = {}
+                for code in all_codes:
+                    for prefix, hours, rows, selected_date in (("p1", hours1, day_rows1, selected_date_1), ("p2", hours2, day_rows2, selected_date_2)):
+                        counts = hour_counts(hours, code)
+                        # A code absent on one date has no spread there to explain
+                        if counts.empty:
+                            continue
+                        jobs[f"{prefix}_{code}"] = (counts, code, selected_date, status_toggle, sample_requests(rows, code))
+                with st.spinner(f"Analyzing {len(jobs)} error spreads..."):
+                    for analysis_key, result in analyze_error_spreads(jobs):
                         st.session_state["analysis_results"][analysis_key] = result
-                if analysis_key in st.session_state["analysis_results"]:
-                    st.write(st.session_state["analysis_results"][analysis_key])
-
-            with col2:
-                df2_hourly = filt_df2[filt_df2['response_status_code'] == row._1].copy()
-                df2_hourly['hour'] = df2_hourly['timestamp'].dt.hour
-                fig2, ax2 = plt.subplots()
-                hourly_counts2 = df2_hourly.groupby('hour').size()
-                ax2.bar(hourly_counts2.index, hourly_counts2.values)
-                ax2.set_title(f"{selected_date_2} Error {row._1}")
-                ax2.set_xlabel("Hour")
-                ax2.set_ylabel("Count")
-                plt.tight_layout()
-                st.pyplot(fig2)
-                plt.close(fig2)
-
-                analysis_key = f"p2_{row._1}"
-                if st.button(f"🧠 Analyze {row._1} on {selected_date_2}", key=analysis_key):
-                    with st.spinner("Analyzing..."):
-                        result = analyze_error_hourly_spread(df2_hourly, row._1, selected_date_2, status_toggle)
-                        st.session_state["analysis_results"][analysis_key] = result
-                if analysis_key in st.session_state["analysis_results"]:
-                    st.write(st.session_state["analysis_results"][analysis_key])
-
+                        result_slots[analysis_key].write(result)
+
+drilldown_unit(view_key, cube1, cube2)
+
+record("script run", time.perf_counter() - script_start)
+with st.sidebar.expander("⏱ Startup timings"):
+    st.dataframe(pd.DataFrame(breakdown()), hide_index=True)
+flight_stats = in_flight.stats()
+st.sidebar.caption(f"LLM requests: {flight_stats['issued']} issued · {flight_stats['coalesced']} coalesced · {flight_stats['in_flight']} in flight")
+chart_stats = chart_cache.stats()
+st.sidebar.caption(
+    f"Charts: {chart_stats['hit_rate']:.0%} cache hits · {chart_stats['misses']} rendered in {chart_stats['render_seconds']:.1f}s · "
+    f"{chart_stats['entries']} cached ({chart_stats['bytes'] / 1e6:.1f} MB)"
+)
 
 # # === app.py ===
 # import streamlit as st
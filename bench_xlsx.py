@@ -0,0 +1,72 @@
+import os
+import argparse
+import tempfile
+import time
+import pandas as pd
+from importdata import read_xlsx_fast
+
+DASHBOARD_COLUMNS = ['timestamp', 'service_name', 'endpoint', 'region', 'response_status_code', 'latency_ms']
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def write_edge_cases(directory):
+    # Sheets the bundled export does not exercise: an empty string cell (openpyxl writes
+    # it as an inlineStr with no <is>), a blank row in the middle of the data and a
+    # workbook on the 1904 date system
+    import openpyxl
+    missing = os.path.join(directory, "missing_string.xlsx")
+    pd.DataFrame({"timestamp": ["2025-01-01"], "response_status_code": [200], "service_name": [None]}).to_excel(missing, index=False)
+
+    gap = os.path.join(directory, "blank_row.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for ref, value in (("A1", "response_status_code"), ("B1", "service_name"), ("A2", 200), ("B2", "RouteService"), ("A4", 500), ("B4", "SearchService")):
+        sheet[ref] = value
+    workbook.save(gap)
+
+    epoch_1904 = os.path.join(directory, "date1904.xlsx")
+    workbook = openpyxl.Workbook()
+    workbook.epoch = openpyxl.utils.datetime.CALENDAR_MAC_1904
+    sheet = workbook.active
+    sheet.append(["timestamp", "response_status_code"])
+    sheet.append([pd.Timestamp("2025-05-01 12:00").to_pydatetime(), 500])
+    workbook.save(epoch_1904)
+    return [missing, gap, epoch_1904]
+
+
+def check_edge_cases():
+    with tempfile.TemporaryDirectory() as directory:
+        for path in write_edge_cases(directory):
+            pd.testing.assert_frame_equal(pd.read_excel(path, engine="openpyxl"), read_xlsx_fast(path))
+            print(f"  {os.path.basename(path)}: matches openpyxl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare read_xlsx_fast with pd.read_excel (openpyxl).")
+    parser.add_argument("path", nargs="?", default="api_telemetry_2_months.xlsx")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    openpyxl_s, expected = best_of(lambda: pd.read_excel(args.path, engine="openpyxl"), args.repeat)
+    fast_s, actual = best_of(lambda: read_xlsx_fast(args.path), args.repeat)
+    projected_s, _ = best_of(lambda: read_xlsx_fast(args.path, columns=DASHBOARD_COLUMNS), args.repeat)
+
+    pd.testing.assert_frame_equal(expected, actual)
+
+    print(f"{args.path}: {expected.shape[0]:,} rows x {expected.shape[1]} columns (best of {args.repeat})")
+    print(f"  openpyxl               {openpyxl_s:7.3f}s")
+    print(f"  fast                   {fast_s:7.3f}s  ({openpyxl_s / fast_s:.1f}x)")
+    print(f"  fast, {len(DASHBOARD_COLUMNS)} columns       {projected_s:7.3f}s  ({openpyxl_s / projected_s:.1f}x)")
+    check_edge_cases()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_MB", "64")) * 2**20
+
+
+def chart_key(kind, title, *series):
+    # Same kind, title and plotted values draw the same PNG
+    digest = hashlib.sha256(f"{kind}\0{title}".encode("utf-8"))
+    for values in series:
+        values = np.asarray(values)
+        digest.update(f"\0{len(values)}".encode("utf-8"))
+        digest.update(pd.util.hash_array(values).tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    # Rendered chart PNGs in memory, shared by every session in the process. Past
+    # max_bytes the least recently used go first.
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def put(self, key, data, render_seconds):
+        # A freshly rendered chart; counted as the miss that made it necessary
+        with self._lock:
+            self.misses += 1
+            self.render_seconds += render_seconds
+            if key in self._entries or len(data) > self.max_bytes:
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+
+    def png(self, key, render):
+        # render() returns PNG bytes; it runs only on a miss
+        data = self.get(key)
+        if data is None:
+            start = time.perf_counter()
+            data = render()
+            self.put(key, data, time.perf_counter() - start)
+        return data
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "render_seconds": self.render_seconds,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+chart_cache = ChartCache()
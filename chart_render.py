@@ -0,0 +1,108 @@
+import io
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from startup_profile import phase
+
+# Processes drawing charts off the script thread; 1 or less draws them in-thread
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _figure():
+    # Object-oriented Agg figures share no pyplot state, so any thread or process can draw one
+    with phase("import matplotlib"):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _png(fig):
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def line_chart(x, y, title):
+    fig = _figure()
+    ax = fig.subplots()
+    ax.plot(x, y, marker='o')
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Count")
+    ax.tick_params(axis='x', labelrotation=45)
+    return _png(fig)
+
+
+def hourly_bar_chart(x, y, title):
+    fig = _figure()
+    ax = fig.subplots()
+    ax.bar(x, y)
+    ax.set_title(title)
+    ax.set_xlabel("Hour")
+    ax.set_ylabel("Count")
+    return _png(fig)
+
+
+CHARTS = {"line": line_chart, "hourly_bar": hourly_bar_chart}
+
+
+def render(kind, x, y, title):
+    return CHARTS[kind](x, y, title)
+
+
+def _timed_render(kind, x, y, title):
+    start = time.perf_counter()
+    png = render(kind, x, y, title)
+    return png, time.perf_counter() - start
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the dashboard process is threaded, and forking it is not safe
+            context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=CHART_RENDER_WORKERS, mp_context=context)
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_many(jobs, workers=CHART_RENDER_WORKERS):
+    # jobs maps a key to render's (kind, x, y, title). Yields (key, png, seconds) in
+    # completion order, so each chart can be shown as soon as it is drawn.
+    if not jobs:
+        return
+    if workers <= 1 or len(jobs) == 1:
+        for key, args in jobs.items():
+            yield (key, *_timed_render(*args))
+        return
+    pool = _get_pool()
+    futures = {pool.submit(_timed_render, *args): key for key, args in jobs.items()}
+    pending = dict(jobs)
+    try:
+        for future in as_completed(futures):
+            key = futures[future]
+            png, seconds = future.result()
+            del pending[key]
+            yield key, png, seconds
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and draw what is left here
+        _reset_pool(pool)
+        for key, args in pending.items():
+            yield (key, *_timed_render(*args))
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+import pandas as pd
+from importdata import fetch_columns, slice_day
+from aggregates import append_cubes, hour_positions, merge_cubes
+from filter_index import FilterIndex
+from ingest import ingest_sources, resolve_sources, sources_signature
+
+
+class TelemetryDataset:
+    # Everything loaded from one source (a file, directory or glob), shared read-only
+    # by every session in the process
+    def __init__(self, source, parts, signature, previous=None):
+        self.source = source
+        self.parts = parts
+        self.signature = signature
+        self.cube, self.filter_index = _cube_and_index(parts, previous)
+        self.loaded_at = time.time()
+        self._memory_bytes = None
+
+    @property
+    def row_count(self):
+        return sum(len(part.df) for part in self.parts)
+
+    def memory_usage(self):
+        if self._memory_bytes is None:
+            frames = [part.df for part in self.parts] + [self.cube]
+            self._memory_bytes = int(sum(frame.memory_usage(index=True, deep=True).sum() for frame in frames))
+        return self._memory_bytes
+
+    def filter_period(self, start, end, services=None, endpoints=None, regions=None):
+        # The cube cells of one period and sidebar selection: the period is a binary
+        # search on the hour-sorted cube, the selection a bitmap lookup over just its rows
+        first, stop = hour_positions(self.cube, start, end)
+        return self.filter_index.filter(self.cube, services, endpoints, regions, start=first, stop=stop)
+
+    def day_rows(self, date):
+        # Hot rows for one day across all parts; 'part' says which file a row came from
+        frames = [slice_day(part.df, date).assign(part=i) for i, part in enumerate(self.parts)]
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def fetch(self, rows, columns):
+        # Columns outside HOT_COLUMNS, for just these rows, from each file's columnar cache.
+        # A file replaced or removed since it was loaded contributes no rows.
+        frames = [
+            fetch_columns(self.parts[part].filepath, group['row_id'], columns, self.parts[part].signature)
+            for part, group in rows.groupby('part', sort=False)
+        ]
+        return pd.concat(frames) if frames else pd.DataFrame(columns=list(columns))
+
+
+def _cube_and_index(parts, previous):
+    # After a drop of new files, only their cubes are aggregated and indexed and then
+    # appended to previous's. Anything else (a file changed or removed, or new hours
+    # that overlap old ones) re-merges every part.
+    if previous is not None:
+        kept = {id(part) for part in previous.parts}
+        added = [part for part in parts if id(part) not in kept]
+        if len(parts) - len(added) == len(kept):
+            if not added:
+                return previous.cube, previous.filter_index
+            later = added[0].cube if len(added) == 1 else merge_cubes(*(part.cube for part in added))
+            cube = append_cubes(previous.cube, later)
+            if cube is not None:
+                return cube, previous.filter_index.extended(later)
+    cube = parts[0].cube if len(parts) == 1 else merge_cubes(*(part.cube for part in parts))
+    return cube, FilterIndex(cube)
+
+
+_shared_datasets = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_dataset(source):
+    key = os.path.abspath(source)
+    signature = sources_signature(resolve_sources(source))
+
+    # Held across the load so concurrent sessions wait for one parse instead of racing
+    with _shared_lock:
+        dataset = _shared_datasets.get(key)
+        if dataset is None or dataset.signature != signature:
+            previous_parts = dataset.parts if dataset is not None else ()
+            dataset = TelemetryDataset(source, ingest_sources(source, previous_parts), signature, dataset)
+            _shared_datasets[key] = dataset
+        return dataset
+
+
+def invalidate_shared_dataset(source=None):
+    with _shared_lock:
+        if source is None:
+            _shared_datasets.clear()
+        else:
+            _shared_datasets.pop(os.path.abspath(source), None)
+
+
+def shared_memory_usage():
+    with _shared_lock:
+        return {key: dataset.memory_usage() for key, dataset in _shared_datasets.items()}
@@ -0,0 +1,114 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A stand-in for an Azure OpenAI deployment, for exercising retries, throttling and the
+# circuit breaker locally. Point the app at it with
+#   AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8765 AZURE_OPENAI_API_KEY=fake
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _next_request(self):
+        with self.server.lock:
+            self.server.requests += 1
+            return self.server.requests
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        number = self._next_request()
+        server = self.server
+
+        if server.throttle_every and number % server.throttle_every == 0:
+            self._send_json(
+                429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                {"Retry-After": str(server.retry_after)},
+            )
+            return
+        if random.random() < server.fail_rate:
+            self._send_json(503, {"error": {"code": "503", "message": "Service unavailable."}})
+            return
+
+        time.sleep(server.latency)
+        answer = f"Fake answer #{number} to a {len(request.get('messages', []))}-message prompt."
+        if request.get("stream"):
+            self._stream(answer)
+        else:
+            self._send_json(200, {
+                "id": f"fake-{number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+    def _stream(self, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in answer.split(" "):
+            chunk = {
+                "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": "fake",
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def make_server(port=8765, latency=0.2, token_delay=0.02, throttle_every=0, retry_after=1, fail_rate=0.0, verbose=False):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    server.latency = latency
+    server.token_delay = token_delay
+    server.throttle_every = throttle_every
+    server.retry_after = retry_after
+    server.fail_rate = fail_rate
+    server.verbose = verbose
+    server.requests = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Azure OpenAI chat completions.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each answer starts")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed words")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.port, args.latency, args.token_delay, args.throttle_every, args.retry_after, args.fail_rate, args.verbose
+    )
+    print(f"Fake Azure OpenAI on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+FILTER_DIMENSIONS = ['service_name', 'endpoint', 'region']
+# Resolved selections kept per index, per selection and row range; each is one int per selected row
+SELECTION_CACHE_SIZE = 64
+
+
+def _append_bits(packed, length, bits):
+    # packed holds length bits (None: all clear); returns them followed by bits. Only the
+    # last, partly filled byte is unpacked.
+    if packed is None:
+        packed = np.zeros((length + 7) // 8, dtype=np.uint8)
+    whole = length // 8
+    tail = np.unpackbits(packed[whole:], count=length - whole * 8)
+    return np.concatenate([packed[:whole], np.packbits(np.concatenate([tail, bits]))])
+
+
+class FilterIndex:
+    # One packed bitmap per distinct value of each filter dimension of a frame, built
+    # once when the frame is loaded. A multiselect combination resolves to row positions
+    # by ORing the chosen values' bitmaps within a dimension and ANDing across them.
+    def __init__(self, frame, dimensions=FILTER_DIMENSIONS):
+        self.dimensions = list(dimensions)
+        self.length = len(frame)
+        self.bitmaps = {}
+        for col in self.dimensions:
+            codes, values = pd.factorize(frame[col])
+            self.bitmaps[col] = {value: np.packbits(codes == code) for code, value in enumerate(values)}
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def extended(self, later):
+        # The index of this frame followed by later's rows, built from later alone
+        index = FilterIndex(later.iloc[:0], self.dimensions)
+        index.length = self.length + len(later)
+        for col in self.dimensions:
+            codes, values = pd.factorize(later[col])
+            added = {value: codes == code for code, value in enumerate(values)}
+            absent = np.zeros(len(later), dtype=bool)
+            index.bitmaps[col] = {
+                value: _append_bits(self.bitmaps[col].get(value), self.length, added.get(value, absent))
+                for value in self.bitmaps[col].keys() | added.keys()
+            }
+        return index
+
+    def _resolve(self, selection, start, stop):
+        # Only the bitmap bytes covering [start, stop) are combined and unpacked
+        first, last = start // 8, -(-stop // 8)
+        empty = np.zeros(last - first, dtype=np.uint8)
+        bits = None
+        for col, selected in zip(self.dimensions, selection):
+            if not selected:
+                continue
+            bitmaps = self.bitmaps[col]
+            chosen = np.bitwise_or.reduce([bitmaps[value][first:last] if value in bitmaps else empty for value in selected])
+            bits = chosen if bits is None else bits & chosen
+        offset = first * 8
+        return np.flatnonzero(np.unpackbits(bits)[start - offset:stop - offset]) + start
+
+    def positions(self, *selected, start=0, stop=None):
+        # Ascending row positions in [start, stop) matching one selection per dimension
+        # (empty or None means no filter on it), or None when nothing is filtered
+        stop = self.length if stop is None else stop
+        selection = tuple(tuple(sorted(values, key=str)) if values else () for values in selected)
+        if not any(selection):
+            return None
+        key = (selection, start, stop)
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                self.hits += 1
+                return self._selections[key]
+        positions = self._resolve(selection, start, stop)
+        with self._lock:
+            self.misses += 1
+            self._selections[key] = positions
+            if len(self._selections) > SELECTION_CACHE_SIZE:
+                self._selections.popitem(last=False)
+        return positions
+
+    def filter(self, frame, *selected, start=0, stop=None):
+        # Rows [start, stop) of frame matching the selection; only those rows are copied,
+        # and none when every row in the range matches
+        stop = self.length if stop is None else stop
+        positions = self.positions(*selected, start=start, stop=stop)
+        if positions is None or len(positions) == stop - start:
+            return frame.iloc[start:stop]
+        return frame.take(positions)
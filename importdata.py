@@ -1,25 +1,585 @@
 import os
+import re
+import json
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 
-def load_data_from_csv(filepath):
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Bump whenever _prepare changes the shape of the cached frame
+CACHE_VERSION = 5
+CACHE_METADATA_KEY = b"telemetry_cache"
+# Streamed caches are written chunk by chunk and finalized (sorted, compacted) on read
+CACHE_LAYOUT_KEY = b"telemetry_layout"
+
+# Low-cardinality dimensions stored as categoricals in compact mode
+CATEGORY_COLUMNS = [
+    'service_name', 'endpoint', 'region', 'http_method', 'protocol', 'source_app',
+    'backend_server', 'cache_status', 'response_status_text', 'error_code',
+    'exception_type', 'reported_issue_type', 'corrective_action_taken',
+    'subscription_tier', 'feature_flag_enabled', 'region_datacenter', 'compliance_flags',
+]
+# Other text columns become categorical when at most this share of values is distinct
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+STATUS_CATEGORIES = ['Failure', 'Success']
+
+# What the dashboard reads for every row; anything else is fetched per row with fetch_columns
+HOT_COLUMNS = ['timestamp', 'service_name', 'endpoint', 'region', 'response_status_code', 'latency_ms']
+# Needed to derive the columns below, so always read even when projecting
+REQUIRED_COLUMNS = ['timestamp', 'response_status_code']
+# Added by _prepare; row_id is the row's position in the (sorted) cache table
+DERIVED_COLUMNS = ['status', 'epoch_hour', 'epoch_day', 'row_id']
+
+NS_PER_HOUR = 3_600 * 10**9
+# epoch_day / epoch_hour of rows whose timestamp could not be parsed; sorts first like NaT
+MISSING_EPOCH = np.iinfo(np.int32).min
+
+# Pinned CSV dtypes so every chunk of a streamed file yields the same schema;
+# other columns are pinned from a sample (see csv_dtypes)
+CSV_DTYPES = {
+    'timestamp': str, 'service_name': str, 'endpoint': str, 'region': str,
+    'response_status_code': 'Int16', 'latency_ms': 'float64',
+}
+CSV_SAMPLE_ROWS = 1_000
+CSV_MIN_CHUNK_ROWS = 1_000
+# Working copies alive per chunk: parsed frame, derived columns, Arrow table, cube groupby
+CSV_CHUNK_OVERHEAD = 4
+
+# "fast" streams the sheet XML directly (read_xlsx_fast); "openpyxl" goes through pd.read_excel
+XLSX_ENGINE = "fast"
+
+
+def source_signature(filepath, compact=False):
+    stat = os.stat(filepath)
+    return {
+        "path": os.path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "version": CACHE_VERSION,
+        "compact": compact,
+    }
+
+
+def _cache_path(filepath, compact=False, variant=None):
+    directory, name = os.path.split(os.path.abspath(filepath))
+    variant = variant or ("compact.cache" if compact else "cache")
+    return os.path.join(directory, f".{name}.{variant}.arrow")
+
+
+def _open_cache(filepath, signature, variant=None):
+    path = _cache_path(filepath, signature["compact"], variant)
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        # Uncompressed Arrow IPC over a memory map: buffers are not copied on read,
+        # and columns that are never selected are never paged in
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    metadata = table.schema.metadata or {}
+    if json.loads(metadata.get(CACHE_METADATA_KEY, b"{}")) != signature:
+        return None
+    return table
+
+
+def _wanted(columns):
+    return {col.strip().lower() for col in columns} | set(REQUIRED_COLUMNS) | set(DERIVED_COLUMNS)
+
+
+def _projection(names, columns):
+    if columns is None:
+        return list(names)
+    wanted = _wanted(columns)
+    return [name for name in names if name.strip().lower() in wanted]
+
+
+def _read_cache(filepath, signature, columns=None):
+    table = _open_cache(filepath, signature)
+    if table is None:
+        return None
+    df = table.select(_projection(table.column_names, columns)).to_pandas(split_blocks=True)
+    layout = json.loads((table.schema.metadata or {}).get(CACHE_LAYOUT_KEY, b"{}"))
+    if not layout.get("finalized", True):
+        df = _finalize(df, signature["compact"])
+    return df
+
+
+def cache_is_fresh(filepath, compact=False):
+    return _open_cache(filepath, source_signature(filepath, compact)) is not None
+
+
+def cached_frame_is_fresh(filepath, signature, variant):
+    return _open_cache(filepath, signature, variant) is not None
+
+
+def read_cached_frame(filepath, signature, variant):
+    # Any other per-source frame cached next to the source (e.g. its rollup cube)
+    table = _open_cache(filepath, signature, variant)
+    return None if table is None else table.to_pandas()
+
+
+class CacheWriter:
+    # Appends prepared frames to a source's Arrow cache. The new file replaces the
+    # old cache only when the block exits cleanly, so readers never see a partial one.
+    # Without pyarrow, writes are dropped and there is simply no cache.
+    def __init__(self, filepath, signature, finalized=True, variant=None, types=None):
+        self.path = _cache_path(filepath, signature["compact"], variant)
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.signature = signature
+        self.finalized = finalized
+        # {column: Arrow type} for every column; without it the first frame's inferred
+        # schema is used, which is only safe when a single frame is written
+        self.types = types
+        self.schema = None
+        self._sink = None
+        self._writer = None
+
+    def write(self, df):
+        if pa is None:
+            return
+        if self.schema is None and self.types is not None:
+            # Pandas metadata only, so extension dtypes like Int16 read back as themselves
+            pandas_metadata = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False).metadata
+            self.schema = pa.schema([pa.field(col, self.types[col]) for col in df.columns], metadata=pandas_metadata)
+        table = pa.Table.from_pandas(df, preserve_index=False, schema=self.schema)
+        if self._writer is None:
+            metadata = dict(table.schema.metadata or {})
+            metadata[CACHE_METADATA_KEY] = json.dumps(self.signature).encode()
+            metadata[CACHE_LAYOUT_KEY] = json.dumps({"finalized": self.finalized}).encode()
+            self.schema = table.schema.with_metadata(metadata)
+            table = table.replace_schema_metadata(metadata)
+            self._sink = pa.OSFile(self.tmp_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._writer.write_table(table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+        if exc_type is None and self._writer is not None:
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return False
+
+
+def _write_cache(filepath, signature, df, variant=None):
+    if pa is None:
+        return
+    try:
+        with CacheWriter(filepath, signature, variant=variant) as writer:
+            writer.write(df)
+    except (OSError, pa.ArrowException):
+        # A missing cache only costs a re-parse next time
+        pass
+
+
+def write_cached_frame(filepath, signature, variant, df):
+    _write_cache(filepath, signature, df, variant)
+
+
+def _compact(df):
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif series.dtype == object:
+            distinct = series.nunique(dropna=True)
+            if col in CATEGORY_COLUMNS or distinct <= CATEGORY_MAX_DISTINCT_RATIO * max(len(series), 1):
+                df[col] = series.astype('category')
+    return df
+
+
+def _derive(df):
+    # Row-local normalization, safe to run on any chunk of a source
+    df.columns = [col.strip().lower() for col in df.columns]
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+
+    ns = df['timestamp'].array.asi8
+    missing = df['timestamp'].isna().to_numpy()
+    df['epoch_hour'] = np.where(missing, MISSING_EPOCH, ns // NS_PER_HOUR).astype(np.int32)
+    df['epoch_day'] = np.where(missing, MISSING_EPOCH, ns // (24 * NS_PER_HOUR)).astype(np.int32)
+
+    # Derive 'status' column: 2xx is Success, anything else (including missing) is Failure
+    codes = pd.to_numeric(df['response_status_code'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    df['status'] = np.where((codes // 100) == 2, 'Success', 'Failure').astype(object)
+    return df
+
+
+def _finalize(df, compact=False):
+    # Sorted once here so period and day selection can binary-search instead of masking.
+    # NaT goes first because searchsorted compares the underlying int64, where NaT is smallest.
+    df = df.sort_values('timestamp', na_position='first', kind='stable', ignore_index=True)
+    if compact:
+        df['status'] = pd.Categorical(df['status'], categories=STATUS_CATEGORIES)
+        df = _compact(df)
+    return df
+
+
+def _prepare(df, compact=False):
+    df = _finalize(_derive(df), compact)
+    df['row_id'] = np.arange(len(df), dtype=np.int64)
+    return df
+
+
+_XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+# Built-in number formats that render as dates or times
+_XLSX_DATE_FORMAT_IDS = set(range(14, 23)) | {45, 46, 47}
+_XLSX_EPOCH = np.datetime64('1899-12-30', 'ms')
+# Serial day 0 of workbooks saved with the 1904 date system (workbookPr date1904)
+_XLSX_EPOCH_1904 = np.datetime64('1904-01-01', 'ms')
+_MS_PER_DAY = 86_400 * 10**3
+# Same strings pd.read_excel turns into NaN by default
+_XLSX_NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+
+def _xlsx_first_sheet(archive):
+    # The first sheet's path in the archive and the epoch its date serials count from
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    properties = workbook.find(f'{_XLSX_NS}workbookPr')
+    date1904 = properties is not None and properties.get('date1904', '').lower() in ('1', 'true')
+    epoch = _XLSX_EPOCH_1904 if date1904 else _XLSX_EPOCH
+    sheet = workbook.find(f'{_XLSX_NS}sheets/{_XLSX_NS}sheet')
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    rel_id = sheet.get(f'{_XLSX_REL_NS}id')
+    for rel in rels:
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target').lstrip('/')
+            return (target if target.startswith('xl/') else f'xl/{target}'), epoch
+    return 'xl/worksheets/sheet1.xml', epoch
+
+
+def _xlsx_shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return np.empty(0, dtype=object)
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f'{_XLSX_NS}si':
+                # Rich text splits one string over several <r><t> runs
+                text = ''.join(t.text or '' for t in elem.iter(f'{_XLSX_NS}t'))
+                strings.append(np.nan if text in _XLSX_NA_STRINGS else text)
+                elem.clear()
+    return np.array(strings, dtype=object)
+
+
+def _xlsx_date_styles(archive):
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    styles = ET.fromstring(archive.read('xl/styles.xml'))
+    date_formats = set(_XLSX_DATE_FORMAT_IDS)
+    for fmt in styles.iter(f'{_XLSX_NS}numFmt'):
+        code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', '', fmt.get('formatCode', '')).lower()
+        if any(token in code for token in 'ymdhs'):
+            date_formats.add(int(fmt.get('numFmtId')))
+    cell_xfs = styles.find(f'{_XLSX_NS}cellXfs')
+    if cell_xfs is None:
+        return set()
+    return {i for i, xf in enumerate(cell_xfs) if int(xf.get('numFmtId', 0)) in date_formats}
+
+
+@lru_cache(maxsize=None)
+def _xlsx_letters_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def _xlsx_column_index(ref):
+    return _xlsx_letters_index(ref.rstrip('0123456789'))
+
+
+class _XlsxColumn:
+    # Typed buffer for one sheet column: shared-string ids or floats, object list once mixed
+    def __init__(self, epoch=_XLSX_EPOCH):
+        self.epoch = epoch
+        self.kind = None
+        self.values = None
+        self.is_date = False
+        self.leading_missing = 0
+
+    def _to_objects(self, shared):
+        self.values = list(self._finish(shared)) if self.values is not None else []
+        self.kind = 'o'
+
+    def append(self, kind, value, shared):
+        if self.kind is None:
+            self.kind = kind
+            self.values = array('q') if kind == 's' else array('d') if kind == 'n' else []
+            for _ in range(self.leading_missing):
+                self.append_missing()
+        elif self.kind != kind and self.kind != 'o':
+            self._to_objects(shared)
+        if self.kind == 'o':
+            value = shared[value] if kind == 's' else value
+        self.values.append(value)
+
+    def append_missing(self):
+        if self.kind == 's':
+            self.values.append(-1)
+        elif self.kind == 'n':
+            self.values.append(np.nan)
+        elif self.kind is not None:
+            self.values.append(np.nan)
+        else:
+            self.leading_missing += 1
+
+    def _finish(self, shared):
+        if self.kind == 's':
+            ids = np.frombuffer(self.values, dtype=np.int64)
+            out = shared.take(np.where(ids < 0, 0, ids)) if len(shared) else np.full(len(ids), np.nan, dtype=object)
+            out[ids < 0] = np.nan
+            return out
+        if self.kind == 'n':
+            values = np.frombuffer(self.values, dtype=np.float64)
+            if self.is_date:
+                # Rounded to milliseconds like openpyxl; pandas' datetime math elsewhere assumes ns
+                ms = np.round(values * _MS_PER_DAY)
+                dates = self.epoch + np.nan_to_num(ms).astype(np.int64).astype('timedelta64[ms]')
+                return np.where(np.isnan(ms), np.datetime64('NaT'), dates).astype('datetime64[ns]')
+            if not np.isnan(values).any() and (values == np.round(values)).all():
+                return values.astype(np.int64)
+            return values
+        return np.array(self.values, dtype=object)
+
+    def finish(self, shared, length):
+        if self.kind is None:
+            # An empty column reads as float NaN, as with read_excel
+            return np.full(length, np.nan)
+        values = self._finish(shared)
+        if self.kind == 'o' and all(isinstance(v, bool) for v in values):
+            return values.astype(bool)
+        return values
+
+
+def read_xlsx_fast(filepath, columns=None):
+    # Streams the first sheet with iterparse instead of building an openpyxl cell per value.
+    # Only the named columns (matched after strip().lower()) are buffered.
+    wanted = {col.strip().lower() for col in columns} if columns is not None else None
+    with zipfile.ZipFile(filepath) as archive:
+        shared = _xlsx_shared_strings(archive)
+        date_styles = _xlsx_date_styles(archive)
+        sheet_path, epoch = _xlsx_first_sheet(archive)
+
+        names = None
+        buffers = {}
+        n_rows = 0
+        last_row = 0
+        cell_tag, row_tag = f'{_XLSX_NS}c', f'{_XLSX_NS}row'
+        value_tag, inline_tag = f'{_XLSX_NS}v', f'{_XLSX_NS}is'
+        with archive.open(sheet_path) as f:
+            for _, row in ET.iterparse(f):
+                if row.tag != row_tag:
+                    continue
+                # Rows with no cells are left out of the sheet; r says where the next one sits
+                number = int(row.get('r', last_row + 1))
+                if names is not None:
+                    for _ in range(number - last_row - 1):
+                        for buffer in buffers.values():
+                            buffer.append_missing()
+                        n_rows += 1
+                last_row = number
+                if names is None:
+                    names = {}
+                    for cell in row.iter(cell_tag):
+                        v = cell.find(value_tag)
+                        text = shared[int(v.text)] if cell.get('t') == 's' else (v.text if v is not None else None)
+                        if text is None:
+                            text = ''.join(t.text or '' for t in cell.iter(f'{_XLSX_NS}t'))
+                        if wanted is None or str(text).strip().lower() in wanted:
+                            col = _xlsx_column_index(cell.get('r'))
+                            names[col] = str(text)
+                            buffers[col] = _XlsxColumn(epoch)
+                    row.clear()
+                    continue
+
+                seen = set()
+                for cell in row.iter(cell_tag):
+                    col = _xlsx_column_index(cell.get('r'))
+                    buffer = buffers.get(col)
+                    if buffer is None:
+                        continue
+                    kind = cell.get('t', 'n')
+                    if kind == 'inlineStr':
+                        inline = cell.find(inline_tag)
+                        if inline is None:
+                            # How openpyxl writes a missing string: the cell with no <is>
+                            continue
+                        text = ''.join(t.text or '' for t in inline.iter(f'{_XLSX_NS}t'))
+                        buffer.append('o', np.nan if text in _XLSX_NA_STRINGS else text, shared)
+                    else:
+                        v = cell.find(value_tag)
+                        if v is None or v.text is None:
+                            continue
+                        if kind == 's':
+                            buffer.append('s', int(v.text), shared)
+                        elif kind == 'n':
+                            if int(cell.get('s', 0)) in date_styles:
+                                buffer.is_date = True
+                            buffer.append('n', float(v.text), shared)
+                        elif kind == 'b':
+                            buffer.append('o', v.text == '1', shared)
+                        else:
+                            buffer.append('o', np.nan if v.text in _XLSX_NA_STRINGS else v.text, shared)
+                    seen.add(col)
+                for col, buffer in buffers.items():
+                    if col not in seen:
+                        buffer.append_missing()
+                n_rows += 1
+                row.clear()
+
+    return pd.DataFrame({names[col]: buffers[col].finish(shared, n_rows) for col in sorted(buffers)})
+
+
+def load_data_from_csv(filepath, use_cache=True, compact=False, engine=None, columns=None):
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"{filepath} not found.")
-    
+
     ext = os.path.splitext(filepath)[1].lower()
-    
+    if ext not in [".csv", ".xlsx", ".xls"]:
+        raise ValueError("Unsupported file format. Use .csv or .xlsx")
+
+    signature = source_signature(filepath, compact)
+    if use_cache:
+        df = _read_cache(filepath, signature, columns)
+        if df is not None:
+            return df
+
+    # The cache must hold every column so fetch_columns can serve the ones projected away here
+    read_columns = None if use_cache and pa is not None else columns
+    usecols = None
+    if read_columns is not None:
+        wanted = _wanted(read_columns)
+        usecols = lambda name: name.strip().lower() in wanted
+
+    engine = engine or XLSX_ENGINE
     if ext == ".csv":
-        df = pd.read_csv(filepath)
-    elif ext in [".xlsx", ".xls"]:
-        df = pd.read_excel(filepath)
+        df = pd.read_csv(filepath, usecols=usecols)
+    elif ext == ".xlsx" and engine == "fast":
+        df = read_xlsx_fast(filepath, columns=None if read_columns is None else sorted(_wanted(read_columns)))
     else:
-        raise ValueError("Unsupported file format. Use .csv or .xlsx")
+        df = pd.read_excel(filepath, usecols=usecols)
 
-    df.columns = [col.strip().lower() for col in df.columns]
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+    df = _prepare(df, compact)
+
+    if use_cache:
+        _write_cache(filepath, signature, df)
+
+    return df[_projection(df.columns, columns)]
+
+
+def fetch_columns(filepath, row_ids, columns, signature):
+    # Heavy columns for just the given row_ids, served from the memory-mapped cache.
+    # row_ids are positions in the version of the file signature describes; once the
+    # file has changed or gone they mean nothing, and no rows are returned.
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    table = _open_cache(filepath, signature)
+    if table is None:
+        try:
+            unchanged = source_signature(filepath, signature["compact"]) == signature
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            return pd.DataFrame(columns=list(columns), index=pd.Index([], dtype=np.int64, name='row_id'))
+        # Loading without a projection (re)writes the full cache when pyarrow is available
+        df = load_data_from_csv(filepath, compact=signature["compact"])
+        table = _open_cache(filepath, signature)
+        if table is None:
+            return df.loc[row_ids, list(columns)].set_index(pd.Index(row_ids, name='row_id'))
+
+    rows = table.select(list(columns)).take(pa.array(row_ids)).to_pandas()
+    return rows.set_index(pd.Index(row_ids, name='row_id'))
+
+
+def csv_dtypes(filepath):
+    sample = pd.read_csv(filepath, nrows=CSV_SAMPLE_ROWS)
+    dtypes = {}
+    for col in sample.columns:
+        key = col.strip().lower()
+        if key in CSV_DTYPES:
+            dtypes[col] = CSV_DTYPES[key]
+        elif sample[col].isna().all():
+            # Blank throughout the sample (e.g. error_message on 2xx rows): nothing says
+            # it is numeric, and a later chunk may well hold text
+            dtypes[col] = str
+        elif pd.api.types.is_bool_dtype(sample[col]):
+            dtypes[col] = 'boolean'
+        elif pd.api.types.is_numeric_dtype(sample[col]):
+            # float64 rather than int: a later chunk may hold blanks or decimals
+            dtypes[col] = 'float64'
+        else:
+            dtypes[col] = str
+    bytes_per_row = sample.memory_usage(index=False, deep=True).sum() / max(len(sample), 1)
+    return dtypes, bytes_per_row
+
+
+# Arrow type for each dtype csv_dtypes pins
+_CSV_ARROW_TYPES = {str: 'string', 'float64': 'float64', 'boolean': 'bool', 'Int16': 'int16'}
 
-    # Derive 'status' column
-    df['status'] = df['response_status_code'].apply(
-        lambda x: 'Success' if str(x).startswith('2') else 'Failure'
+
+def csv_cache_types(dtypes):
+    # Arrow type of every column a streamed CSV's chunks carry, fixed before the first
+    # chunk: inferred from it, a column blank throughout would be typed null and reject
+    # the first later chunk that holds a value
+    if pa is None:
+        return None
+    types = {col.strip().lower(): pa.type_for_alias(_CSV_ARROW_TYPES[dtype]) for col, dtype in dtypes.items()}
+    types.update(
+        timestamp=pa.timestamp('ns', tz='UTC'), epoch_hour=pa.int32(), epoch_day=pa.int32(),
+        status=pa.string(), row_id=pa.int64(),
     )
+    return types
+
+
+def iter_csv_chunks(filepath, memory_budget, pinned=None):
+    # Derived (unsorted) chunks whose working set stays within memory_budget bytes.
+    # row_id is the row's position in the file, i.e. in a cache written chunk by chunk.
+    # pinned is csv_dtypes(filepath), for callers that already sampled the file.
+    dtypes, bytes_per_row = pinned or csv_dtypes(filepath)
+    chunk_rows = max(CSV_MIN_CHUNK_ROWS, int(memory_budget / (max(bytes_per_row, 1) * CSV_CHUNK_OVERHEAD)))
+    offset = 0
+    with pd.read_csv(filepath, dtype=dtypes, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            chunk = _derive(chunk)
+            chunk['row_id'] = np.arange(offset, offset + len(chunk), dtype=np.int64)
+            offset += len(chunk)
+            yield chunk
+
+
+def _slice_positions(values, lower, upper):
+    return np.searchsorted(values, lower, side='left'), np.searchsorted(values, upper, side='left')
+
+
+def slice_sorted(df, column, lower, upper):
+    # Rows with lower <= column < upper of a frame sorted by column, as a positional slice
+    start, stop = _slice_positions(df[column].to_numpy(), lower, upper)
+    return df.iloc[start:stop]
+
+
+def to_epoch_day(date):
+    return (pd.Timestamp(date) - pd.Timestamp(0)).days
+
+
+def from_epoch_days(days):
+    return list(pd.to_datetime(np.asarray(days, dtype=np.int64), unit='D').date)
+
 
-    return df
\ No newline at end of file
+def slice_day(df, date):
+    day = to_epoch_day(date)
+    return slice_sorted(df, 'epoch_day', day, day + 1)
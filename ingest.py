@@ -0,0 +1,226 @@
+import os
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import importdata
+from importdata import (
+    HOT_COLUMNS, CacheWriter, cache_is_fresh, cached_frame_is_fresh, csv_cache_types, csv_dtypes, iter_csv_chunks,
+    load_data_from_csv, read_cached_frame, source_signature, write_cached_frame,
+)
+from aggregates import build_cube, merge_cubes
+
+# Peak working memory for streamed ingestion; sources larger than this are streamed
+MEMORY_BUDGET = int(os.getenv("TELEMETRY_MEMORY_BUDGET_MB", "256")) * 2**20
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+# A record of what was ingested and how long it took, for people and tooling reading the
+# directory. It is never consulted: each file's own caches, checked against its size and
+# mtime, decide whether it must be parsed again.
+MANIFEST_NAME = ".telemetry_manifest.json"
+# Bump whenever build_cube changes the shape of the cached cube
+CUBE_CACHE_VERSION = 1
+CUBE_VARIANT = "cube"
+# Processes used to parse new files; 0 means one per CPU core
+INGEST_WORKERS = int(os.getenv("TELEMETRY_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def stream_csv(filepath, memory_budget=MEMORY_BUDGET, compact=False):
+    # One pass over the file in bounded chunks: each chunk is folded into the cube and
+    # appended to the source's Arrow cache, then dropped. Returns the cube.
+    signature = source_signature(filepath, compact)
+    cube = None
+    pinned = csv_dtypes(filepath)
+    with CacheWriter(filepath, signature, finalized=False, types=csv_cache_types(pinned[0])) as writer:
+        for chunk in iter_csv_chunks(filepath, memory_budget, pinned):
+            chunk_cube = build_cube(chunk)
+            cube = chunk_cube if cube is None else merge_cubes(cube, chunk_cube)
+            writer.write(chunk)
+    return cube
+
+
+def _is_pattern(source):
+    return glob.has_magic(source)
+
+
+def resolve_sources(source):
+    # A single file, every supported file in a directory, or a glob pattern
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    elif _is_pattern(source):
+        paths = glob.glob(source, recursive=True)
+    else:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"{source} not found.")
+        return [os.path.abspath(source)]
+    paths = [
+        os.path.abspath(path) for path in paths
+        if os.path.isfile(path)
+        and not os.path.basename(path).startswith(".")
+        and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+    ]
+    if not paths:
+        raise FileNotFoundError(f"No telemetry files match {source}.")
+    return sorted(paths)
+
+
+def sources_signature(paths):
+    stats = [(path, os.stat(path)) for path in paths]
+    return tuple((path, stat.st_size, stat.st_mtime_ns) for path, stat in stats)
+
+
+def _manifest_path(source):
+    if os.path.isdir(source):
+        return os.path.join(source, MANIFEST_NAME)
+    if _is_pattern(source):
+        base = source
+        while _is_pattern(base):
+            base = os.path.dirname(base)
+        return os.path.join(base or ".", MANIFEST_NAME)
+    return None
+
+
+def load_manifest(source):
+    path = _manifest_path(source)
+    if path is None or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(source, manifest):
+    path = _manifest_path(source)
+    if path is None:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class TelemetryPart:
+    # One ingested source file: its hot rows and its own rollup cube
+    def __init__(self, filepath, signature, df, cube, load_seconds, parse_seconds=None):
+        self.filepath = filepath
+        self.signature = signature
+        self.df = df
+        self.cube = cube
+        self.load_seconds = load_seconds
+        # Time a worker process spent parsing the file, when it was parsed off-process
+        self.parse_seconds = parse_seconds
+
+
+def _cube_signature(signature):
+    return dict(signature, cube_version=CUBE_CACHE_VERSION)
+
+
+def caches_are_fresh(filepath):
+    # Both caches load_part reads are current, so loading it costs a memory map, not a parse
+    signature = source_signature(filepath, compact=True)
+    return cache_is_fresh(filepath, compact=True) and cached_frame_is_fresh(filepath, _cube_signature(signature), CUBE_VARIANT)
+
+
+def load_part(filepath):
+    start = time.perf_counter()
+    signature = source_signature(filepath, compact=True)
+    cube_signature = _cube_signature(signature)
+
+    cube = read_cached_frame(filepath, cube_signature, CUBE_VARIANT)
+    cube_cached = cube is not None
+    is_large_csv = os.path.splitext(filepath)[1].lower() == ".csv" and signature["size"] > MEMORY_BUDGET
+    if is_large_csv and not cache_is_fresh(filepath, compact=True):
+        # Too big to parse in one go: stream it into the cache, then read back only hot columns
+        cube = stream_csv(filepath, compact=True)
+
+    df = load_data_from_csv(filepath, compact=True, columns=HOT_COLUMNS)
+    if cube is None:
+        cube = build_cube(df)
+    if not cube_cached:
+        write_cached_frame(filepath, cube_signature, CUBE_VARIANT, cube)
+    return TelemetryPart(filepath, signature, df, cube, time.perf_counter() - start)
+
+
+def _parse_to_cache(filepath):
+    # Runs in a worker: parse the file and leave its hot cache and cube next to it.
+    # Only the timing crosses back; the parent memory-maps the caches instead of
+    # unpickling frames.
+    return load_part(filepath).load_seconds
+
+
+def parse_in_parallel(paths, workers=INGEST_WORKERS):
+    # {path: parse seconds} for files parsed by the pool. Without pyarrow the caches
+    # the parent relies on are never written, so nothing is farmed out.
+    workers = min(workers, len(paths))
+    if workers < 2 or importdata.pa is None:
+        return {}
+    # spawn: the dashboard process is threaded, and forking it is not safe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return dict(zip(paths, pool.map(_parse_to_cache, paths)))
+
+
+def ingest_sources(source, previous_parts=(), workers=INGEST_WORKERS):
+    # Parts for every file behind source. Files whose size and mtime match a part in
+    # previous_parts are reused as-is, so a refresh after one new drop parses one file.
+    # The rest are parsed across a process pool, one file per worker at a time.
+    reusable = {part.filepath: part for part in previous_parts}
+    paths = resolve_sources(source)
+    stale = [
+        path for path in paths
+        if path not in reusable or reusable[path].signature != source_signature(path, compact=True)
+    ]
+    # After a restart nothing is reusable, but files with fresh caches need no worker
+    parse_seconds = parse_in_parallel([path for path in stale if not caches_are_fresh(path)], workers)
+
+    # Bookkeeping only; see MANIFEST_NAME
+    manifest = load_manifest(source)
+    parts = []
+    for path in paths:
+        part = reusable.get(path)
+        if path in stale:
+            part = load_part(path)
+            part.parse_seconds = parse_seconds.get(path)
+            manifest[path] = {
+                "size": part.signature["size"],
+                "mtime_ns": part.signature["mtime_ns"],
+                "rows": len(part.df),
+                "cube_cells": len(part.cube),
+                "load_seconds": round(part.load_seconds, 4),
+                "parse_seconds": None if part.parse_seconds is None else round(part.parse_seconds, 4),
+                "ingested_at": time.time(),
+            }
+        parts.append(part)
+
+    current = {part.filepath for part in parts}
+    for path in [path for path in manifest if path not in current]:
+        del manifest[path]
+    _save_manifest(source, manifest)
+    return parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest telemetry files and report per-file timings.")
+    parser.add_argument("source", help="A telemetry file, a directory of them, or a glob")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    parts = ingest_sources(args.source, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    for part in parts:
+        parse = "" if part.parse_seconds is None else f"  parse {part.parse_seconds:7.3f}s"
+        print(f"{part.filepath}: {len(part.df):,} rows  load {part.load_seconds:7.3f}s{parse}")
+    print(f"{len(parts)} file(s), {sum(len(part.df) for part in parts):,} rows in {elapsed:.3f}s with {args.workers} worker(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "50")) * 2**20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def request_key(model, messages, **params):
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # Completed chat responses on disk, shared by every session and process using the
+    # same file. Entries expire after ttl seconds; past max_entries or max_bytes the
+    # least recently used go first. Any sqlite error is treated as a miss.
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT content FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            return None
+        return None if row is None else row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, content, size, now, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from least to most recently used, dropping until both caps hold
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self):
+        try:
+            with closing(self._connect()) as conn:
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        except sqlite3.Error:
+            return {"entries": 0, "bytes": 0}
+        return {"entries": count, "bytes": total}
+
+    def clear(self):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM responses")
+        except sqlite3.Error:
+            pass
+
+
+class FlightAbandoned(Exception):
+    pass
+
+
+class Flight:
+    # One in-flight request. The caller that issued it publishes text deltas; every
+    # caller that joined it can follow them as they arrive.
+    def __init__(self):
+        self.deltas = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def publish(self, delta):
+        with self._cond:
+            self.deltas.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self):
+        seen = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.deltas) > seen or self.done)
+                new, done, error = self.deltas[seen:], self.done, self.error
+            seen += len(new)
+            yield from new
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    # Coalesces concurrent identical requests: the first caller for a key issues it,
+    # later callers join its Flight until it finishes.
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.coalesced = 0
+
+    def join(self, key):
+        # (flight, True) for the caller that must issue the request, (flight, False) for followers
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.issued += 1
+            return flight, True
+
+    def leave(self, key, flight, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is not None and not isinstance(error, Exception):
+            # The issuer was stopped (e.g. a Streamlit rerun); followers must not see that
+            error = FlightAbandoned("The shared request was cancelled before it finished.")
+        flight.finish(error)
+
+    def stats(self):
+        with self._lock:
+            return {"issued": self.issued, "coalesced": self.coalesced, "in_flight": len(self._flights)}
@@ -0,0 +1,184 @@
+import os
+import time
+import random
+import threading
+
+# Steady request rate and burst allowance per deployment
+RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "60"))
+BURST = int(os.getenv("LLM_BURST", "10"))
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+# Wall-clock budget for one logical call, across all of its attempts and waits
+DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+# Consecutive failed attempts that open the breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _wait_time(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self, deadline):
+        # Blocks until a token is free; False if that would run past deadline (monotonic)
+        while True:
+            with self._lock:
+                wait = self._wait_time()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    # closed: calls pass. open: calls fail fast until reset_seconds have passed.
+    # half-open: one trial call decides whether to close again or re-open.
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            raise LLMUnavailableError(
+                f"Azure OpenAI is failing; skipping calls for another {max(remaining, 0):.0f}s."
+            )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+_buckets = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def _guards(deployment):
+    with _registry_lock:
+        if deployment not in _buckets:
+            _buckets[deployment] = TokenBucket(RATE_PER_MINUTE / 60, BURST)
+            _breakers[deployment] = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+        return _buckets[deployment], _breakers[deployment]
+
+
+def breaker_state(deployment):
+    return _guards(deployment)[1].state
+
+
+def _is_retryable(error):
+    # Imported here so that loading this module does not pull in the openai stack
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+def _retry_after(error):
+    # Seconds the server asked us to wait, if it said
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        # An HTTP date; fall back to our own backoff
+        return None
+    return None
+
+
+def _backoff(attempt):
+    # Full jitter: uniform over [0, base * 2^attempt], capped
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def resilient_call(deployment, call, deadline_seconds=DEADLINE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    # call(timeout) makes one request with at most timeout seconds. Throttling, timeouts
+    # and 5xx are retried with backoff (honoring Retry-After) until max_attempts or the
+    # deadline; other errors are raised at once.
+    bucket, breaker = _guards(deployment)
+    deadline = time.monotonic() + deadline_seconds
+    attempt = 0
+    while True:
+        # The token comes first: a half-open breaker's trial slot is claimed only once
+        # the call is certain to go out
+        if not bucket.acquire(deadline):
+            raise LLMUnavailableError(f"Rate limit for {deployment} leaves no room before the {deadline_seconds:.0f}s deadline.")
+        breaker.before_call()
+        try:
+            result = call(deadline - time.monotonic())
+        except Exception as e:
+            retryable = _is_retryable(e)
+            if retryable:
+                breaker.record_failure()
+            else:
+                # The request itself was bad; that says nothing about the service
+                breaker.record_success()
+            attempt += 1
+            if not retryable or attempt >= max_attempts:
+                raise
+            wait = _retry_after(e)
+            wait = _backoff(attempt) if wait is None else wait
+            if time.monotonic() + wait >= deadline:
+                raise LLMUnavailableError(
+                    f"Gave up after {attempt} attempt(s); the next retry would pass the {deadline_seconds:.0f}s deadline."
+                ) from e
+            time.sleep(wait)
+        except BaseException:
+            # Interrupted (e.g. a Streamlit rerun stopping the thread); counted as a
+            # failure so a half-open trial slot is never left claimed
+            breaker.record_failure()
+            raise
+        else:
+            breaker.record_success()
+            return result
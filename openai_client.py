@@ -1,44 +1,227 @@
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 import os
+import time
+import threading
 import base64
 import logging
+from prompt_budget import budget_table, encode_table
+from aggregates import CONTRIBUTION_KEYS, DIFF_THRESHOLD_PCT, diff_totals
+from llm_cache import FlightAbandoned, ResponseCache, SingleFlight, request_key
+from llm_resilience import resilient_call
+from startup_profile import phase
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-def compare_images(image1_b64, image2_b64, df1, df2, status, start_date_1, end_date_1, start_date_2, end_date_2):
-    # Note: image1_b64 and image2_b64 are base64 PNG images generated from matplotlib plots
-
-    def summarize(df):
-        filtered = df[df['status'].str.lower() == status.lower()]
-        return filtered.groupby(['service_name', 'endpoint', 'response_status_code']).size().reset_index(name='count').to_string(index=False)
-
-    df1_summary = summarize(df1)
-    df2_summary = summarize(df2)
+_client = None
+_client_lock = threading.Lock()
+response_cache = ResponseCache()
+# Identical requests already in flight (from any session) are joined, not re-sent
+in_flight = SingleFlight()
+SYSTEM_PROMPT = "You are a reliable API diagnostics assistant."
+# The day-by-day table is computed locally, so the comparison answer is narrative only
+COMPARE_MAX_TOKENS = 800
+
+
+def _request(prompt, max_tokens):
+    model = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    return model, messages, request_key(model, messages, max_tokens=max_tokens)
+
+
+def get_client():
+    # Built on first use: importing openai and constructing the client is most of this
+    # module's import cost, and many sessions never ask for an analysis
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                with phase("openai client"):
+                    from openai import AzureOpenAI
+                    _client = AzureOpenAI(
+                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        # Retries, backoff and deadlines are handled by llm_resilience
+                        max_retries=0
+                    )
+    return _client
+
+
+def _create(model, **kwargs):
+    return resilient_call(model, lambda timeout: get_client().chat.completions.create(model=model, timeout=timeout, **kwargs))
+
+
+def complete(prompt, max_tokens):
+    # Identical deployment + messages + parameters are answered from the shared disk cache
+    model, messages, key = _request(prompt, max_tokens)
+    content = response_cache.get(key)
+    if content is not None:
+        logging.info("LLM cache hit %s", key[:12])
+        return content
+
+    flight, issuer = in_flight.join(key)
+    if not issuer:
+        try:
+            return "".join(flight.follow())
+        except FlightAbandoned:
+            return complete(prompt, max_tokens)
+
+    # The previous issuer may have cached the answer and left between our lookup and join
+    content = response_cache.get(key)
+    if content is not None:
+        flight.publish(content)
+        in_flight.leave(key, flight)
+        return content
+
+    try:
+        response = _create(model, messages=messages, max_tokens=max_tokens)
+        content = response.choices[0].message.content
+        if content:
+            response_cache.put(key, content)
+            flight.publish(content)
+    except BaseException as e:
+        in_flight.leave(key, flight, e)
+        raise
+    in_flight.leave(key, flight)
+    return content
+
+
+class CompletionStream:
+    # Iterate for text deltas as they arrive; nothing is sent until iteration starts.
+    # A cache hit yields the whole answer at once. Once the stream is exhausted, text
+    # holds the full answer (also written to the cache) and the timings are set.
+    def __init__(self, prompt, max_tokens):
+        self.max_tokens = max_tokens
+        self.model, self.messages, self.key = _request(prompt, max_tokens)
+        self.text = None
+        self.cached = False
+        # True when the answer came from an identical request another caller had in flight
+        self.coalesced = False
+        self.time_to_first_token = None
+        self.elapsed = None
+        # budget_table stats when the prompt carries a compacted summary table
+        self.summary_stats = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        content = response_cache.get(self.key)
+        if content is not None:
+            self.cached = True
+            self.text = content
+            self.time_to_first_token = self.elapsed = time.perf_counter() - start
+            yield content
+            return
+
+        deltas = []
+        for delta in self._deltas():
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+                logging.info("LLM first token after %.2fs", self.time_to_first_token)
+            deltas.append(delta)
+            yield delta
+        self.elapsed = time.perf_counter() - start
+        self.text = "".join(deltas)
+
+    def _deltas(self):
+        # Characters already yielded. If a followed flight is abandoned, the request is
+        # joined or issued again and its answer picks up after them.
+        sent = 0
+        while True:
+            flight, issuer = in_flight.join(self.key)
+            if issuer:
+                break
+            self.coalesced = True
+            try:
+                for delta in _after(flight.follow(), sent):
+                    sent += len(delta)
+                    yield delta
+                return
+            except FlightAbandoned:
+                logging.info("Shared LLM request was abandoned; retrying %s", self.key[:12])
+        self.coalesced = False
+
+        # The previous issuer may have cached the answer and left between our lookup and join
+        content = response_cache.get(self.key)
+        if content is not None:
+            self.cached = True
+            flight.publish(content)
+            in_flight.leave(self.key, flight)
+            yield from _after([content], sent)
+            return
+
+        yield from _after(self._issue(flight), sent)
+
+    def _issue(self, flight):
+        response = None
+        try:
+            deltas = []
+            # Retried only up to the first chunk; a stream that breaks midway is not replayed
+            response = _create(self.model, messages=self.messages, max_tokens=self.max_tokens, stream=True)
+            for chunk in response:
+                # Azure sends a leading chunk with no choices (content filter results)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                deltas.append(delta)
+                flight.publish(delta)
+                yield delta
+            text = "".join(deltas)
+            if text:
+                response_cache.put(self.key, text)
+        except BaseException as e:
+            in_flight.leave(self.key, flight, e)
+            raise
+        finally:
+            # An abandoned stream would otherwise hold its connection until collected
+            if response is not None:
+                response.close()
+        in_flight.leave(self.key, flight)
+
+
+def _after(deltas, skip):
+    # The text of deltas past its first skip characters
+    seen = 0
+    for delta in deltas:
+        if seen + len(delta) > skip:
+            yield delta[max(0, skip - seen):]
+        seen += len(delta)
+
+
+def compare_images_prompt(daily, df1, df2, status, start_date_1, end_date_1, start_date_2, end_date_2):
+    # Note: daily is the two periods' per-day counts, aligned, diffed and flagged (aggregates.period_diff);
+    # the model is handed these facts and only has to explain them
+    # df1 and df2 are telemetry cube slices (aggregates.build_cube) for the two periods
+    # Returns the prompt and the summary table's budget_table stats
+
+    summary, stats = budget_table(df1, df2, status, CONTRIBUTION_KEYS)
+    logging.info(
+        "Summary table: %d of %d groups, %d tokens (%d saved)",
+        stats["kept"], stats["groups"], stats["tokens"], stats["tokens_saved"]
+    )
+    totals = diff_totals(daily)
+    folded = ""
+    if stats["kept"] < stats["groups"]:
+        folded = f" Top {stats['kept']} of {stats['groups']} groups by {'|delta|' if stats['rank_by'] == 'delta' else 'count'}; the rest are summed in the last row."
 
     prompt = f"""
 You are an expert in API telemetry diagnostics.
 
-### Visual Input:
-- Two charts showing `{status}` trends over two periods (provided as images).
-
-### Tabular Data (grouped by service, endpoint, HTTP code):
+### Daily Series (`{status}` count per day, aligned by day of period):
+Pipe-delimited. count_1/count_2 = Period 1/Period 2, delta = count_2 - count_1, pct_change = delta / count_1 in %, flagged = |pct_change| > {DIFF_THRESHOLD_PCT:g}%.
+{encode_table(daily)}
+Totals: Period 1 {totals['count_1']}, Period 2 {totals['count_2']}, delta {totals['delta']} ({'n/a' if totals['pct_change'] is None else str(totals['pct_change']) + '%'}); {totals['flagged_days']} flagged day(s).
+These figures are exact; do not recompute them.
 
-#### Period 1 ({start_date_1.date()} → {end_date_1.date()}):
-{df1_summary}
-
-#### Period 2 ({start_date_2.date()} → {end_date_2.date()}):
-{df2_summary}
+### Contributors to the Change (by service, endpoint, region, HTTP code):
+Pipe-delimited, largest |delta| first. p1 = Period 1 ({start_date_1.date()} → {end_date_1.date()}), p2 = Period 2 ({start_date_2.date()} → {end_date_2.date()}), delta = p2 - p1, share_pct = signed share of the summed |delta| across all groups, kind = new / vanished / changed / unchanged.{folded}
+{summary}
 
 ### Tasks:
-1. Identify dates with large differences (>3%) in `{status}` volume.
+1. Explain the flagged days (differences >{DIFF_THRESHOLD_PCT:g}% in `{status}` volume) from the daily series.
 2. Analyze possible causes:
 - Common errors: 401, 403, 404, 429, 500, 503, 504
 - Time-window spikes (e.g., high 500s between 2pm–3pm)
@@ -46,7 +229,7 @@ You are an expert in API telemetry diagnostics.
 - Throttling or backend/server issues
 - Region-specific errors
 - High latency or timeouts
-3. Analyze the tabular data to suggest **possible reasons**, such as:
+3. Analyze the contributors table to suggest **possible reasons**, such as:
     - Missing or invalid parameters in the API request
     - Unauthorized access due to missing or expired tokens (401)
     - Forbidden access when user lacks required permissions (403)
@@ -70,38 +253,38 @@ You are an expert in API telemetry diagnostics.
     - Errors are isolated to specific users or sessions (userId, sessionId)
     - Error messages indicating business logic violations (error field)
 
-
-### Image 1 (base64 PNG):
-{image1_b64[:200]}
-
-### Image 2 (base64 PNG):
-{image2_b64[:200]}
-
 ### Output:
-| Period 1 timeline | Period 1 {status} Value |Period 2 timeline | Period 2 {status} Value | Difference | Observation |
-- get values for each day from respective graphs provided to you and cross check by calculating total count of {status} value for those days from the dataframe shared to you.
-- list all the timelines in markdown
+- Do not reproduce the daily table; it is already shown to the user.
+- For each flagged day, one line: the date pair and a short observation.
 - 3–5 bullet points explaining what might have caused the significant differences.
 - Don’t guess — infer only from data shown
 - **Use easy understandable technical language** suitable for a developer or operations engineer.
 """
 
-    response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-        messages=[
-            {"role": "system", "content": "You are a reliable API diagnostics assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=1500
-    )
+    return prompt, stats
+
+
+def compare_images(*args, **kwargs):
+    prompt, _ = compare_images_prompt(*args, **kwargs)
+    return complete(prompt, max_tokens=COMPARE_MAX_TOKENS)
 
-    return response.choices[0].message.content
 
+def compare_images_stream(*args, **kwargs):
+    prompt, stats = compare_images_prompt(*args, **kwargs)
+    stream = CompletionStream(prompt, max_tokens=COMPARE_MAX_TOKENS)
+    stream.summary_stats = stats
+    return stream
 
-def analyze_error_spread(df, error_code, date, status):
-    hourly_counts = df.groupby(df['timestamp'].dt.hour).size()
+
+def analyze_error_spread_prompt(hourly_counts, error_code, date, status, samples=None):
     hourly_str = "\n".join([f"{hour}: {count}" for hour, count in hourly_counts.items()])
 
+    samples_section = ""
+    if samples is not None and not samples.empty:
+        samples_section = f"""
+### Sample requests with this error ({len(samples)} shown, CSV):
+{samples.to_csv(index=False)}"""
+
     prompt = f"""
 You are an expert in API telemetry diagnostics.
 
@@ -112,21 +295,21 @@ You are an expert in API telemetry diagnostics.
 
 ### Data Summary (hourly counts):
 {hourly_str}
+{samples_section}
 
 ### Output:
 - Provide 2-3 bullet points summarizing insights on which time of day is most affected by this error spread and explain why this error spread happened as observed.
 """
 
-    response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-        messages=[
-            {"role": "system", "content": "You are a reliable API diagnostics assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=800
-    )
+    return prompt
+
+
+def analyze_error_spread(*args, **kwargs):
+    return complete(analyze_error_spread_prompt(*args, **kwargs), max_tokens=800)
+
 
-    return response.choices[0].message.content
+def analyze_error_spread_stream(*args, **kwargs):
+    return CompletionStream(analyze_error_spread_prompt(*args, **kwargs), max_tokens=800)
 
 # from openai import AzureOpenAI
 # from dotenv import load_dotenv
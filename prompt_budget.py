@@ -0,0 +1,94 @@
+import os
+from functools import lru_cache
+import pandas as pd
+from aggregates import group_counts, contributions
+
+# Most tokens a grouped table may take in a prompt before groups are folded into "other"
+SUMMARY_TOKEN_BUDGET = int(os.getenv("LLM_SUMMARY_TOKEN_BUDGET", "2000"))
+# "delta" keeps the groups that moved most between periods, "count" the busiest ones
+SUMMARY_RANK_BY = os.getenv("LLM_SUMMARY_RANK_BY", "delta")
+TOKEN_ENCODING = "o200k_base"
+# Rough size of a token without tiktoken; errs on the high side for digit-heavy tables
+CHARS_PER_TOKEN = 3
+OTHER_LABEL = "(other)"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken is optional and loaded on first count, not at import
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # The encoding file is fetched on first use and may be unreachable
+        return None
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def rank_groups(table, rank_by=SUMMARY_RANK_BY):
+    score = table['delta'].abs() if rank_by == "delta" else table[['p1', 'p2']].max(axis=1)
+    order = score.to_numpy().argsort(kind='stable')[::-1]
+    return table.iloc[order].reset_index(drop=True)
+
+
+def top_groups(ranked, keys, k):
+    # The first k ranked groups, with the rest summed into one "other" row
+    top = ranked.iloc[:k]
+    rest = ranked.iloc[k:]
+    if rest.empty:
+        return top
+    other = {col: "" for col in ranked.columns}
+    other[keys[0]] = f"{OTHER_LABEL} {len(rest)} groups"
+    measures = [col for col in ('p1', 'p2', 'delta', 'share_pct') if col in ranked]
+    for col, total in rest[measures].sum().items():
+        other[col] = round(total, 1) if col == 'share_pct' else int(total)
+    return pd.concat([top, pd.DataFrame([other])], ignore_index=True)
+
+
+def encode_table(table):
+    return table.to_csv(sep='|', index=False, lineterminator='\n').rstrip('\n')
+
+
+def budget_table(cube1, cube2, status, keys, budget=SUMMARY_TOKEN_BUDGET, rank_by=SUMMARY_RANK_BY):
+    # The contributions table encoded to fit in budget tokens, keeping as many of the top
+    # ranked groups as fit. Stats compare it with the two padded to_string tables it replaces.
+    table = contributions(cube1, cube2, status, keys)
+    table[keys] = table[keys].astype(str)
+    ranked = rank_groups(table, rank_by)
+    text = encode_table(ranked)
+    tokens = count_tokens(text)
+    kept = len(ranked)
+    if tokens > budget:
+        # Largest k that still fits; token counts grow with k
+        low, high = 0, len(ranked) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if count_tokens(encode_table(top_groups(ranked, keys, mid))) <= budget:
+                low = mid
+            else:
+                high = mid - 1
+        kept = low
+        text = encode_table(top_groups(ranked, keys, kept))
+        tokens = count_tokens(text)
+
+    baseline_tokens = sum(
+        count_tokens(group_counts(cube, status, keys).to_string(index=False)) for cube in (cube1, cube2)
+    )
+    stats = {
+        "groups": len(ranked),
+        "kept": kept,
+        "rank_by": rank_by,
+        "tokens": tokens,
+        "baseline_tokens": baseline_tokens,
+        "tokens_saved": baseline_tokens - tokens,
+    }
+    return text, stats
@@ -0,0 +1,28 @@
+import time
+from contextlib import contextmanager
+
+# Seconds spent per startup phase in this process: the first (cold) measurement and
+# the most recent one, so script re-runs can be told apart from cold start.
+_cold = {}
+_last = {}
+
+
+def record(name, seconds):
+    _cold.setdefault(name, seconds)
+    _last[name] = seconds
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def breakdown():
+    return [
+        {"phase": name, "cold_s": round(seconds, 3), "last_s": round(_last[name], 3)}
+        for name, seconds in _cold.items()
+    ]